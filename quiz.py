@@ -1,7 +1,17 @@
 import streamlit as st
-import json
+import html
+import pickle
 import random
+from collections import namedtuple
 from pathlib import Path
+try:
+    from orjson import loads as json_loads
+except ImportError:  # optional speedup; stdlib json.loads also accepts bytes
+    from json import loads as json_loads
+try:
+    import ijson
+except ImportError:  # optional; large files are then parsed in one go
+    ijson = None
 
 # ----------------- Page config (must be first Streamlit call) -----------------
 st.set_page_config(
@@ -11,54 +21,218 @@ st.set_page_config(
 )
 
 # ----------------- Helper functions -----------------
-def load_subject_file(path: Path):
-    """Load a JSON subject file. Returns list of blocks or [] on error."""
+# Subject files larger than this are streamed block by block with ijson
+STREAM_MIN_BYTES = 8 * 1024 * 1024
+# Parsed blocks are pickled next to each JSON file (math.json -> math.cache.pkl)
+SIDECAR_SUFFIX = ".cache.pkl"
+
+# Placeholder first option so radios start unanswered
+NO_ANSWER = "Select an answer"
+TF_OPTIONS = (NO_ANSWER, "True", "False")
+
+# Validated question record; attribute access instead of repeated dict .get().
+# ``options`` holds the radio options (NO_ANSWER + choices), built once.
+Question = namedtuple("Question", "type question answer answer_norm options")
+
+# Display order of question types in a quiz
+TYPE_ORDER = {"multiple_choice": 0, "true_false": 1, "short_answer": 2, "fill_blank": 3, "unknown": 4}
+
+# Background color for each question type's section header
+TYPE_COLORS = {
+    "multiple_choice": "#e0f7fa",  # light cyan
+    "true_false": "#fff9c4",       # light yellow
+    "short_answer": "#e1bee7",     # light purple
+    "fill_blank": "#c8e6c9",       # light green
+    "unknown": "#f5f5f5",          # light gray
+}
+
+def type_header_html(q_type, color):
+    """Colored section header shown above the first question of a type."""
+    type_title = html.escape(q_type.replace("_", " ").title())
+    return (
+        f"<div style='background-color: {color}; padding:10px; border-radius:8px; color: #000000;'>"
+        f"<h2 style='margin-bottom:5px'>{type_title} Questions</h2></div>"
+    )
+
+# Header markup is static per type, so build it once
+TYPE_HEADERS = {t: type_header_html(t, c) for t, c in TYPE_COLORS.items()}
+
+def subject_file_keys(base_files):
+    """Return a hashable tuple of (path, mtime) pairs used as the cache key.
+
+    Missing files get an mtime of None so they still load (as empty) and are
+    picked up once they appear on disk."""
+    keys = []
+    for p in base_files:
+        try:
+            mtime = Path(p).stat().st_mtime
+        except OSError:
+            mtime = None
+        keys.append((str(p), mtime))
+    return tuple(keys)
+
+def source_stamp(path: Path):
+    """Exact identity of a JSON file's contents for sidecar validation."""
+    info = path.stat()
+    return (info.st_mtime_ns, info.st_size)
+
+def read_sidecar(path: Path):
+    """Return the blocks pickled next to ``path`` if still fresh, else None.
+
+    A sidecar is only trusted when it was written from a file with exactly
+    the same mtime (ns) and size, so restored or concurrently edited JSON
+    files are re-parsed."""
+    cache_path = path.with_suffix(SIDECAR_SUFFIX)
+    try:
+        with cache_path.open("rb") as f:
+            stamp, blocks = pickle.load(f)
+        if stamp == source_stamp(path):
+            return blocks
+    except Exception:
+        pass  # missing, stale or unreadable sidecar: parse the JSON instead
+    return None
+
+def write_sidecar(path: Path, stamp, blocks):
+    """Pickle parsed blocks next to ``path`` for faster cold starts.
+
+    ``stamp`` must be taken before parsing, so an edit made while parsing
+    leaves a sidecar that no longer matches."""
+    cache_path = path.with_suffix(SIDECAR_SUFFIX)
+    tmp_path = cache_path.with_suffix(".tmp")
     try:
-        with path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data if isinstance(data, list) else []
+        with tmp_path.open("wb") as f:
+            pickle.dump((stamp, blocks), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(cache_path)  # atomic, so readers never see a partial file
+    except Exception:
+        # e.g. read-only deploy; the sidecar is only an optimisation
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+@st.cache_data(show_spinner=False)
+def load_subject_file(path_str: str, mtime):
+    """Load a JSON subject file. Returns (blocks, error message or None).
+
+    ``mtime`` is only part of the cache key so that editing the file
+    invalidates the cached result. Errors are returned rather than shown
+    with st.error, since cached functions replay their Streamlit calls."""
+    path = Path(path_str)
+    try:
+        blocks = read_sidecar(path)
+        if blocks is not None:
+            return blocks, None
+
+        stamp = source_stamp(path)
+        if ijson is not None and stamp[1] >= STREAM_MIN_BYTES:
+            # Yield top-level array items one at a time instead of holding
+            # the raw file and the parsed document in memory together
+            with path.open("rb") as f:
+                blocks = list(ijson.items(f, "item", use_float=True))
+        else:
+            data = json_loads(path.read_bytes())
+            blocks = data if isinstance(data, list) else []
     except FileNotFoundError:
-        return []
+        return [], None
     except Exception as e:
-        st.error(f"Error loading {path.name}: {e}")
-        return []
+        return [], f"Error loading {path.name}: {e}"
+
+    write_sidecar(path, stamp, blocks)
+    return blocks, None
+
+@st.cache_resource(show_spinner=False)
+def gather_subjects(file_keys):
+    """Return (subjects, errors) from (path, mtime) pairs.
 
-def gather_subjects(base_files):
-    """Return dict: subject_name -> list of blocks"""
+    subjects maps subject_name -> list of blocks. Cached as a shared resource
+    so reruns don't unpickle a copy of every block; treat it as read-only."""
     subjects = {}
-    for p in base_files:
-        blocks = load_subject_file(Path(p))
+    errors = []
+    for path_str, mtime in file_keys:
+        blocks, error = load_subject_file(path_str, mtime)
+        if error:
+            errors.append(error)
         for block in blocks:
             subj = block.get("subject", "Unknown")
             subjects.setdefault(subj, []).append(block)
-    return subjects
-
-def get_topics_and_grades(blocks):
-    """From a list of blocks, return sorted unique topics and grades"""
-    topics = sorted({b.get("topic", "General") for b in blocks})
-    grades = sorted({b.get("grade", None) for b in blocks if "grade" in b})
-    return topics, grades
-
-def collect_questions_from_blocks(blocks, selected_topic, selected_grade):
-    """Return flattened list of question dicts filtered by topic & grade."""
-    out = []
+    return subjects, errors
+
+def valid_questions(block):
+    """Return the block's questions that have a type, question and answer."""
+    return [
+        q
+        for q in block.get("questions", ())
+        if "type" in q and "question" in q and "answer" in q
+    ]
+
+@st.cache_resource(show_spinner=False)
+def build_question_index(file_keys, subject):
+    """Precompute filtering for one subject.
+
+    Returns (topics, grades, index) where index maps (topic, grade) to the
+    flattened list of Question records; None in either slot means "All".
+    Cached as a shared resource (not pickled/copied per rerun), so callers
+    must treat the result as read-only.
+    """
+    subjects, _ = gather_subjects(file_keys)
+    blocks = subjects.get(subject, [])
+
+    # Single pass: collect unique topics/grades while filling the index
+    topics, grades, index = set(), set(), {}
     for b in blocks:
-        if (selected_topic in (None, "All") or b.get("topic") == selected_topic) and \
-           (selected_grade in (None, "All") or b.get("grade") == selected_grade):
-            qs = b.get("questions", [])
-            for q in qs:
-                if "type" in q and "question" in q and "answer" in q:
-                    out.append(q)
-    return out
+        topic = b.get("topic", "General")
+        topics.add(topic)
+        if "grade" in b:
+            grades.add(b["grade"])
+        grade = b.get("grade")
+
+        qs = [
+            Question(
+                q["type"],
+                q["question"],
+                q["answer"],
+                normalize_answer(q["answer"]),
+                (NO_ANSWER, *(q.get("choices") or ())),
+            )
+            for q in valid_questions(b)
+        ]
+        for key in {(topic, grade), (topic, None), (None, grade), (None, None)}:
+            index.setdefault(key, []).extend(qs)
+    return sorted(topics), sorted(grades), index
+
+def index_for(index, topic, grade):
+    """Look up questions for a topic/grade selection ("All" matches everything)."""
+    key = (None if topic == "All" else topic, None if grade == "All" else grade)
+    return index.get(key, [])
 
 def normalize_answer(ans):
     if ans is None:
         return ""
     return str(ans).strip().lower()
 
+def md_cell(value):
+    """Escape a value for use inside a markdown table cell."""
+    return html.escape(str(value)).replace("|", "\\|").replace("\n", " ")
+
+def score_exact(user_norms, questions):
+    """Mark normalized user answers that match the correct answer exactly."""
+    return [user == q.answer_norm for user, q in zip(user_norms, questions)]
+
+def score_true_false(user_norms, questions):
+    """Like score_exact, but only a literal true/false answer can pass."""
+    return [user in ("true", "false") and user == q.answer_norm for user, q in zip(user_norms, questions)]
+
+# q_type -> batch scorer; types not listed use score_exact
+SCORERS = {
+    "true_false": score_true_false,
+}
+
 # ----------------- Load subject files -----------------
 subject_files = ["math.json", "english.json", "science.json"]
-subjects_data = gather_subjects(subject_files)
+subject_keys = subject_file_keys(subject_files)
+subjects_data, load_errors = gather_subjects(subject_keys)
+for msg in load_errors:
+    st.error(msg)
 
 if not subjects_data:
     st.error("No subject JSON files found or files are empty. Place math.json, english.json, science.json in this folder.")
@@ -75,121 +249,98 @@ if "quiz_config" not in st.session_state:
     st.session_state.quiz_config = {}
 
 # ----------------- UI: Tabs per subject -----------------
+@st.fragment
+def render_subject_tab(subject):
+    """Render one subject's quiz setup; its reruns don't rebuild sibling tabs."""
+    st.header(f"{subject}")
+    topics, grades, index = build_question_index(subject_keys, subject)
+
+    topic_choices = ["All"] + topics if topics else ["All"]
+    grade_choices = ["All"] + grades if grades else ["All"]
+
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        chosen_topic = st.selectbox(f"Select topic ({subject})", topic_choices, key=f"topic_{subject}")
+    with col2:
+        chosen_grade = st.selectbox(f"Select grade ({subject})", grade_choices, key=f"grade_{subject}")
+
+    # O(1) index lookup, shared by the Start button and the info panel
+    all_qs = index_for(index, chosen_topic, chosen_grade)
+
+    start_col, info_col = st.columns([1, 3])
+    with start_col:
+        if st.button("▶ Start Quiz", key=f"start_{subject}"):
+            if not all_qs:
+                st.warning("No questions found for that topic/grade. Try 'All' or another topic.")
+            else:
+                # 1️⃣ Pick a random sample of up to 10 questions (already in random order)
+                selected = random.sample(all_qs, min(10, len(all_qs)))
+
+                # 2️⃣ Group by type; the sort is stable so order within a type stays random
+                selected.sort(key=lambda q: TYPE_ORDER.get(q.type, TYPE_ORDER["unknown"]))
+
+                # 3️⃣ Store in session
+                st.session_state.quiz_questions = selected
+
+                st.session_state.quiz_subject = subject
+                st.session_state.quiz_config = {"topic": chosen_topic, "grade": chosen_grade}
+                st.session_state.version += 1
+                st.rerun()  # ✅ use st.rerun (replaces experimental_rerun)
+
+    with info_col:
+        total_avail = len(all_qs)
+        st.write(f"Selected topic: **{chosen_topic}** — Grade: **{chosen_grade}**")
+        st.write(f"Available questions: **{total_avail}**")
+        st.write("Click **Start Quiz** to begin!")
+
 tabs = st.tabs(list(subjects_data.keys()))
 for tab, subject in zip(tabs, subjects_data.keys()):
     with tab:
-        st.header(f"{subject}")
-        blocks = subjects_data[subject]
-        topics, grades = get_topics_and_grades(blocks)
-
-        topic_choices = ["All"] + topics if topics else ["All"]
-        grade_choices = ["All"] + grades if grades else ["All"]
-
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            chosen_topic = st.selectbox(f"Select topic ({subject})", topic_choices, key=f"topic_{subject}")
-        with col2:
-            chosen_grade = st.selectbox(f"Select grade ({subject})", grade_choices, key=f"grade_{subject}")
-
-        start_col, info_col = st.columns([1, 3])
-        with start_col:
-            if st.button("▶ Start Quiz", key=f"start_{subject}"):
-                all_qs = collect_questions_from_blocks(
-                    blocks,
-                    chosen_topic if chosen_topic != "All" else None,
-                    chosen_grade if chosen_grade != "All" else None
-                )
-                if not all_qs:
-                    st.warning("No questions found for that topic/grade. Try 'All' or another topic.")
-                else:
-                    # 1️⃣ Pick a random sample of up to 10 questions
-                    selected = random.sample(all_qs, min(10, len(all_qs)))
-
-                    # 2️⃣ Group by type
-                    type_groups = {}
-                    for q in selected:
-                        q_type = q.get("type", "unknown")
-                        type_groups.setdefault(q_type, []).append(q)
-
-                    # 3️⃣ Shuffle within each type
-                    for q_type in type_groups:
-                        random.shuffle(type_groups[q_type])
-
-                    # 4️⃣ Flatten back to a list, keeping type order
-                    grouped_questions = []
-                    for q_type in ["multiple_choice", "true_false", "short_answer", "fill_blank", "unknown"]:
-                        grouped_questions.extend(type_groups.get(q_type, []))
-
-                    # 5️⃣ Store in session
-                    st.session_state.quiz_questions = grouped_questions
-
-                    st.session_state.quiz_subject = subject
-                    st.session_state.quiz_config = {"topic": chosen_topic, "grade": chosen_grade}
-                    st.session_state.version += 1
-                    st.rerun()  # ✅ use st.rerun (replaces experimental_rerun)
-
-        with info_col:
-            total_avail = len(
-                collect_questions_from_blocks(
-                    blocks,
-                    chosen_topic if chosen_topic != "All" else None,
-                    chosen_grade if chosen_grade != "All" else None,
-                )
-            )
-            st.write(f"Selected topic: **{chosen_topic}** — Grade: **{chosen_grade}**")
-            st.write(f"Available questions: **{total_avail}**")
-            st.write("Click **Start Quiz** to begin!")
+        render_subject_tab(subject)
 
 # ----------------- Quiz UI -----------------
-if st.session_state.quiz_questions and st.session_state.quiz_subject:
-    st.markdown("---")
-    st.subheader(
-        f"Quiz — {st.session_state.quiz_subject} "
-        f"(Topic: {st.session_state.quiz_config.get('topic')}, "
-        f"Grade: {st.session_state.quiz_config.get('grade')})"
-    )
+@st.fragment
+def render_quiz():
+    """Render the active quiz; reruns from its widgets stay inside this fragment."""
+    # Read session state once up front
+    ss = st.session_state
+    questions = ss.quiz_questions
+    subject = ss.quiz_subject
+    cfg = ss.quiz_config
+    version = ss.version
+    topic = cfg.get("topic")
+    grade = cfg.get("grade")
 
-    questions = st.session_state.quiz_questions
-    version = st.session_state.version
+    st.markdown("---")
+    st.subheader(f"Quiz — {subject} (Topic: {topic}, Grade: {grade})")
 
     with st.form("quiz_form"):
         user_answers = []
-        # Define colors for each question type
-        type_colors = {
-            "multiple_choice": "#e0f7fa",  # light cyan
-            "true_false": "#fff9c4",       # light yellow
-            "short_answer": "#e1bee7",     # light purple
-            "fill_blank": "#c8e6c9",       # light green
-            "unknown": "#f5f5f5",          # light gray
-        }
-
         current_type = None
         for i, q in enumerate(questions):
-            q_type = q.get("type", "unknown")
+            q_type = q.type
+
+            # Static markdown for this question is sent as one element
+            md_parts = []
 
             # -------------------- Type Header --------------------
             if q_type != current_type:
                 current_type = q_type
-                type_title = q_type.replace("_", " ").title()
-                # start a container with background color
-                st.markdown("---")  # horizontal line between questions
-                st.markdown(f"<div style='background-color: {type_colors.get(q_type, '#f5f5f5')}; padding:10px; border-radius:8px; color: #000000;'>  <!-- dark text color -->"
-                            f"<h2 style='margin-bottom:5px'>{type_title} Questions</h2></div>",unsafe_allow_html=True)
-                            
-            # -------------------- Question Separator --------------------
-            st.markdown("---")  # horizontal line between questions
-
-            # -------------------- Question Text --------------------
-            st.markdown(f"### Q{i+1}")
-            st.markdown(f"**{q.get('question')}**")
+                md_parts.append("---")  # horizontal line between type sections
+                md_parts.append(TYPE_HEADERS.get(q_type) or type_header_html(q_type, TYPE_COLORS["unknown"]))
+
+            # -------------------- Question Separator + Text --------------------
+            md_parts.append("---")  # horizontal line between questions
+            md_parts.append(f"### Q{i+1}")
+            md_parts.append(f"**{html.escape(str(q.question))}**")  # escaped: unsafe_allow_html below
+            st.markdown("\n\n".join(md_parts), unsafe_allow_html=True)
             key = f"q{i}_v{version}"
 
             # -------------------- Question Input --------------------
             if q_type == "multiple_choice":
-                choices = q.get("choices", [])
                 ans = st.radio(
                     f"Choose answer for Q{i+1}",
-                    ["Select an answer"] + choices if choices else ["Select an answer"],
+                    q.options,
                     key=key,
                     index=0,
                 )
@@ -198,7 +349,7 @@ if st.session_state.quiz_questions and st.session_state.quiz_subject:
             elif q_type == "true_false":
                 ans = st.radio(
                     f"True or False for Q{i+1}",
-                    ["Select an answer", "True", "False"],
+                    TF_OPTIONS,
                     key=key,
                     index=0,
                 )
@@ -216,43 +367,33 @@ if st.session_state.quiz_questions and st.session_state.quiz_subject:
                 ans = st.text_input(f"Answer for Q{i+1}", key=key)
                 user_answers.append(ans)
 
-        # Close the colored container at the end of each type section
-        st.markdown("</div>", unsafe_allow_html=True)
-
-
         submitted = st.form_submit_button("Submit Answers")
 
     if submitted:
-        score = 0
         total = len(questions)
         st.subheader("Results")
+        # Score each type as one batch, then render the results in order
+        by_type = {}
         for i, q in enumerate(questions):
-            correct_raw = q.get("answer")
-            correct = normalize_answer(correct_raw)
-            user_raw = user_answers[i]
-            user = normalize_answer(user_raw)
-
-            q_type = q.get("type")
-            pass_mark = False
-
-            if q_type in ("short_answer", "fill_blank"):
-                if user == correct:
-                    pass_mark = True
-            elif q_type == "multiple_choice":
-                if normalize_answer(user_raw) == correct:
-                    pass_mark = True
-            elif q_type == "true_false":
-                if user in ("true", "false") and user == correct:
-                    pass_mark = True
-            else:
-                if user == correct:
-                    pass_mark = True
+            by_type.setdefault(q.type, []).append(i)
+
+        results = [False] * total
+        for q_type, idxs in by_type.items():
+            scorer = SCORERS.get(q_type, score_exact)
+            marks = scorer(
+                [normalize_answer(user_answers[i]) for i in idxs],
+                [questions[i] for i in idxs],
+            )
+            for i, pass_mark in zip(idxs, marks):
+                results[i] = pass_mark
+        score = sum(results)
 
-            if pass_mark:
-                st.success(f"✅ Q{i+1}: Correct — {q.get('question')}")
-                score += 1
-            else:
-                st.error(f"❌ Q{i+1}: Incorrect — Your answer: **{user_raw or 'Blank'}** | Correct: **{q.get('answer')}**")
+        # One markdown table for all results instead of an element per question
+        rows = [
+            f"| Q{i+1} | {'✅' if pass_mark else '❌'} | {md_cell(user_answers[i] or 'Blank')} | {md_cell(q.answer)} |"
+            for i, (q, pass_mark) in enumerate(zip(questions, results))
+        ]
+        st.markdown("| # | Result | Your answer | Correct |\n|---|---|---|---|\n" + "\n".join(rows))
 
         st.markdown(f"### Final Score: **{score} / {total}**")
         if score == total:
@@ -262,10 +403,13 @@ if st.session_state.quiz_questions and st.session_state.quiz_subject:
     reset_col, spacer = st.columns([1, 4])
     with reset_col:
         if st.button("🔄 New Set of Questions"):
-            st.session_state.quiz_questions = []
-            st.session_state.quiz_subject = None
-            st.session_state.quiz_config = {}
-            st.session_state.version += 1
+            ss.quiz_questions = []
+            ss.quiz_subject = None
+            ss.quiz_config = {}
+            ss.version = version + 1
             st.rerun()  # ✅ use st.rerun instead of st.experimental_rerun
+
+if st.session_state.quiz_questions and st.session_state.quiz_subject:
+    render_quiz()
 else:
     st.info("No active quiz. Choose a subject tab, pick topic/grade, and click 'Start Quiz' to begin.")